@@ -1,24 +1,57 @@
 import os
+import sys
+import atexit
+import signal
 import time
 import threading
-import http.server
-import socketserver
-import random
-import requests
-import json
+import queue
+import asyncio
+import orjson
+import httpx
+from aiohttp import web
 import numpy as np
-import pandas as pd
+from numba import njit
+from collections import deque
 from datetime import datetime
 
 # --- 1. PERSISTENCE LAYER ---
 class PersistenceManager:
     FILE_NAME = "bot_memory.json"
-    
+    # Single-slot queue: a pending snapshot is replaced, never queued behind
+    _queue = queue.Queue(maxsize=1)
+    _writer = None
+    _write_lock = threading.Lock()
+
     @staticmethod
     def save(state_dict):
+        # Hand the snapshot to the writer thread so disk I/O stays off the trading loop
+        if PersistenceManager._writer is None:
+            PersistenceManager._writer = threading.Thread(target=PersistenceManager._write_loop, daemon=True)
+            PersistenceManager._writer.start()
+        q = PersistenceManager._queue
+        try:
+            q.put_nowait(state_dict)
+        except queue.Full:
+            with q.mutex:
+                if q.queue:
+                    q.queue[0] = state_dict # Latest wins
+                    return
+            q.put_nowait(state_dict) # Writer drained the slot in between
+
+    @staticmethod
+    def _write_loop():
+        while True:
+            PersistenceManager.write(PersistenceManager._queue.get())
+
+    @staticmethod
+    def write(state_dict):
+        # Write to a temp file and rename so a crash never leaves a torn file
+        tmp_name = PersistenceManager.FILE_NAME + ".tmp"
         try:
-            with open(PersistenceManager.FILE_NAME, "w") as f:
-                json.dump(state_dict, f)
+            with PersistenceManager._write_lock:
+                with open(tmp_name, "wb") as f:
+                    f.write(orjson.dumps(state_dict))
+                os.replace(tmp_name, PersistenceManager.FILE_NAME)
         except Exception as e:
             print(f"[ERROR] Failed to save memory: {e}")
 
@@ -26,36 +59,129 @@ class PersistenceManager:
     def load():
         if os.path.exists(PersistenceManager.FILE_NAME):
             try:
-                with open(PersistenceManager.FILE_NAME, "r") as f:
-                    return json.load(f)
+                with open(PersistenceManager.FILE_NAME, "rb") as f:
+                    return orjson.loads(f.read())
             except Exception as e:
                 print(f"[ERROR] Failed to load memory: {e}")
         return None
 
 # --- 2. SHARED STATE ---
 class BotState:
-    logs = []
-    watchlist = [] 
-    positions = []
-    
+    MAX_LOGS = 100
+    MAX_WATCHLIST = 8
+    MAX_POSITIONS = 500 # Oldest positions are dropped beyond this
+    STATUS_POSITIONS = 100 # Most recent positions served on /status
+    FLUSH_INTERVAL = 10 # Seconds between persistence flushes
+    # Numeric position fields -> the parallel array that holds them
+    POSITION_COLUMNS = {"entryPrice": "pos_entry", "currentPrice": "pos_current",
+                        "size": "pos_size", "pnl": "pos_pnl", "roi": "pos_roi"}
+
     def __init__(self):
+        # Serialized /status body, valid while its version matches _status_version
+        self._status_version = 0
+        self._status_cache = (-1, b"")
+        # Bounded deques: O(1) append with automatic eviction of the oldest entry
+        self.logs = deque(maxlen=self.MAX_LOGS)
+        self.watchlist = deque(maxlen=self.MAX_WATCHLIST)
+        self._set_positions([])
+        self._state_dirty = False
+        self._saved_signature = None
+        self._last_flush = time.monotonic()
         saved_data = PersistenceManager.load()
         if saved_data:
-            self.watchlist = saved_data.get("watchlist", [])
-            self.positions = saved_data.get("positions", [])
+            self.watchlist.extend(saved_data.get("watchlist", []))
+            self._set_positions(saved_data.get("positions", []))
             self.add_log("💾 [SYSTEM] MEMORY RECOVERED.", "SYSTEM")
         else:
             self.add_log("🆕 [SYSTEM] NO MEMORY FOUND. Starting fresh.", "SYSTEM")
+        self._saved_signature = self._signature()
+        atexit.register(self.flush_state, True)
+
+    def _set_positions(self, positions):
+        # Structure-of-arrays: metadata stays in dicts, numbers live in parallel float64 arrays
+        positions = positions[-self.MAX_POSITIONS:]
+        self.pos_meta = [{k: v for k, v in p.items() if k not in self.POSITION_COLUMNS} for p in positions]
+        self.pos_market = np.array([p['market'] for p in positions], dtype=str)
+        for key, attr in self.POSITION_COLUMNS.items():
+            setattr(self, attr, np.array([p[key] for p in positions], dtype=np.float64))
+
+    def add_whale(self, whale):
+        self.watchlist.append(whale)
+        self._invalidate_status()
+
+    def add_position(self, position):
+        self.pos_meta.append({k: v for k, v in position.items() if k not in self.POSITION_COLUMNS})
+        self.pos_market = np.append(self.pos_market, position['market'])
+        for key, attr in self.POSITION_COLUMNS.items():
+            setattr(self, attr, np.append(getattr(self, attr), position[key]))
+        if len(self.pos_meta) > self.MAX_POSITIONS:
+            del self.pos_meta[0]
+            self.pos_market = self.pos_market[1:]
+            for attr in self.POSITION_COLUMNS.values():
+                setattr(self, attr, getattr(self, attr)[1:])
+        self._invalidate_status()
+
+    def update_positions(self, market, price):
+        # Re-mark every position in `market` at the live price in one vectorized pass
+        m = self.pos_market == market
+        if not m.any() or (self.pos_current[m] == price).all(): return # Already marked at this price
+        shares = self.pos_size / self.pos_entry
+        self.pos_current[m] = price
+        self.pos_pnl[m] = np.round(shares * price - self.pos_size, 2)[m]
+        self.pos_roi[m] = np.round((price - self.pos_entry) / self.pos_entry, 4)[m]
+        self._invalidate_status()
+
+    def positions_payload(self, limit=None):
+        # Materialize dicts only for serialization (/status, persistence), newest `limit` only
+        start = -limit if limit else 0
+        columns = [getattr(self, attr)[start:].tolist() for attr in self.POSITION_COLUMNS.values()]
+        return [dict(meta, **dict(zip(self.POSITION_COLUMNS, values)))
+                for meta, *values in zip(self.pos_meta[start:], *columns)]
+
+    def _invalidate_status(self):
+        self._status_version += 1
+
+    def status_bytes(self):
+        version, body = self._status_cache
+        if version != self._status_version:
+            # Capture the version first so a concurrent mutation leaves the cache stale, not wrong
+            version = self._status_version
+            body = orjson.dumps({
+                "logs": list(self.logs),
+                "watchlist": list(self.watchlist),
+                "positions": self.positions_payload(self.STATUS_POSITIONS)
+            })
+            self._status_cache = (version, body)
+        return body
+
+    def mark_dirty(self):
+        self._state_dirty = True
+
+    def _signature(self):
+        # Cheap fingerprint of what is persisted; identical => skip the write
+        return (len(self.watchlist), self.watchlist[-1]['address'] if self.watchlist else None,
+                len(self.pos_meta), self.pos_meta[-1]['id'] if self.pos_meta else None)
 
-    def save_state(self):
-        data = { "watchlist": self.watchlist, "positions": self.positions }
-        PersistenceManager.save(data)
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL:
+            self.flush_state()
+
+    def flush_state(self, sync=False):
+        self._last_flush = time.monotonic()
+        if not self._state_dirty: return
+        self._state_dirty = False
+        signature = self._signature()
+        if signature == self._saved_signature: return
+        self._saved_signature = signature
+        data = { "watchlist": list(self.watchlist), "positions": self.positions_payload() }
+        if sync: PersistenceManager.write(data) # Shutdown: the daemon writer may not get to run
+        else: PersistenceManager.save(data)
     
     def add_log(self, msg, category="SYSTEM"):
         timestamp = datetime.now().strftime("%H:%M:%S")
         print(f"[{category}] {msg}", flush=True)
         self.logs.append({"timestamp": timestamp, "message": msg, "category": category})
-        if len(self.logs) > 100: self.logs.pop(0)
+        self._invalidate_status()
 
 state = BotState()
 
@@ -65,54 +191,78 @@ class GammaClient:
         self.base_url = "https://gamma-api.polymarket.com/events"
         self.params = {"slug": "presidential-election-winner-2024"}
         self.last_known_price = 0.50 # Fallback
+        self._cache_ts = 0.0
+        self._cache_ttl = 5.0 # Seconds a fetched price stays fresh
+        # Position of the Trump market in the event's market list, verified by id
+        self._market_idx = None
+        self._market_id = None
+        # HTTP/2 keep-alive client: future market polls multiplex over one TLS connection
+        self.client = httpx.AsyncClient(
+            http2=True,
+            timeout=5,
+            limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=60),
+            headers={"User-Agent": "alpha-bot/1.0"}
+        )
+
+    async def close(self):
+        await self.client.aclose()
 
-    def get_trump_price(self):
+    @staticmethod
+    def _first_outcome_price(raw):
+        # outcomePrices is usually a string array '["0.55", "0.45"]'; Index 0 is YES.
+        # Slice the first element out instead of running a JSON decode per poll.
+        if isinstance(raw, str) and raw.startswith('['):
+            first = raw.partition(',')[0].strip('[]" ')
+            return float(first) # Empty array raises, keeping the last known price
+        outcomes = orjson.loads(raw) if isinstance(raw, (str, bytes)) else raw
+        return float(outcomes[0])
+
+    def _find_trump_market(self, markets):
+        idx = self._market_idx
+        if idx is not None and idx < len(markets) and markets[idx].get('id') == self._market_id:
+            return markets[idx]
+        for i, m in enumerate(markets):
+            # Find the Donald Trump specific market
+            # Checking Title or specific question logic
+            if "Donald Trump" in m.get('groupItemTitle', ''):
+                self._market_idx, self._market_id = i, m.get('id')
+                return m
+        return None
+
+    async def get_trump_price(self):
+        now = time.monotonic()
+        if now - self._cache_ts < self._cache_ttl:
+            return self.last_known_price
         try:
             # Fetch the specific event for US Election
-            r = requests.get(self.base_url, params=self.params, timeout=5)
+            r = await self.client.get(self.base_url, params=self.params)
             if r.status_code == 200:
-                data = r.json()
+                data = orjson.loads(r.content)
                 if data:
-                    markets = data[0].get('markets', [])
-                    for m in markets:
-                        # Find the Donald Trump specific market
-                        # Checking Title or specific question logic
-                        if "Donald Trump" in m.get('groupItemTitle', ''):
-                            # outcomePrices is usually a string array ["0.55", "0.45"]
-                            outcomes = json.loads(m.get('outcomePrices', '["0.5","0.5"]'))
-                            self.last_known_price = float(outcomes[0]) # Assuming Index 0 is YES
-                            return self.last_known_price
+                    m = self._find_trump_market(data[0].get('markets', []))
+                    if m is not None:
+                        self.last_known_price = self._first_outcome_price(m.get('outcomePrices', '["0.5","0.5"]'))
+                        self._cache_ts = now
             return self.last_known_price
         except Exception as e:
             # Silent fail to logs to keep loop running
             return self.last_known_price
 
 # --- 4. API SERVER ---
-class APIHandler(http.server.SimpleHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == '/status':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            data = {
-                "logs": state.logs,
-                "watchlist": state.watchlist,
-                "positions": state.positions
-            }
-            self.wfile.write(json.dumps(data).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
+async def handle_status(request):
+    return web.Response(body=state.status_bytes(), content_type='application/json',
+                        headers={'Access-Control-Allow-Origin': '*'})
 
-def start_api_server():
+async def start_api_server():
+    # Served from the same event loop as the trading engine
     PORT = int(os.getenv("PORT", 8080))
-    socketserver.TCPServer.allow_reuse_address = True
-    with socketserver.TCPServer(("", PORT), APIHandler) as httpd:
-        state.add_log(f"API Server listening on port {PORT}", "SYSTEM")
-        httpd.serve_forever()
-
-threading.Thread(target=start_api_server, daemon=True).start()
+    app = web.Application()
+    app.router.add_get('/status', handle_status)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, port=PORT, reuse_address=True).start()
+    state.add_log(f"API Server listening on port {PORT}", "SYSTEM")
+    return runner
 
 # --- 5. RISK ENGINE (KELLY) ---
 class RiskManager:
@@ -130,36 +280,77 @@ class RiskManager:
         final_pct = min(safe_pct, self.MAX_BANKROLL_PCT)
         return max(0, bankroll * final_pct)
 
+    def calculate_bet_sizes(self, bankroll, win_probs, odds):
+        # Vectorized Kelly over many whales at once; same clamping as calculate_bet_size
+        win_probs = np.asarray(win_probs, dtype=np.float64)
+        b = np.asarray(odds, dtype=np.float64) - 1
+        kelly_pct = np.where(b > 0, (b * win_probs - (1 - win_probs)) / np.maximum(b, 1e-9), 0.0)
+        final_pct = np.clip(kelly_pct * self.KELLY_FRACTION, 0.0, self.MAX_BANKROLL_PCT)
+        return bankroll * final_pct
+
 # --- 6. TRIBUNAL SCORER ---
+STATUS_NO_DATA, STATUS_WASH, STATUS_APPROVED, STATUS_REJECTED = 0, 1, 2, 3
+STATUS_NAMES = ('NO_DATA', 'REJECTED_WASH_TRADING', 'APPROVED', 'REJECTED')
+
+@njit(cache=True, fastmath=True)
+def score_kernel(entry, exit_p, size):
+    # Returns (raw_score, status code); one pass for totals, one for the downside std
+    n = entry.size
+    if n == 0: return 0.0, STATUS_NO_DATA
+    total_vol = 0.0
+    total_pnl = 0.0
+    roi_sum = 0.0
+    neg_sum = 0.0
+    neg_n = 0
+    for i in range(n):
+        diff = exit_p[i] - entry[i]
+        roi = diff / entry[i]
+        total_vol += size[i]
+        total_pnl += diff * size[i]
+        roi_sum += roi
+        if roi < 0:
+            neg_sum += roi
+            neg_n += 1
+    wash_ratio = total_vol / (abs(total_pnl) + 1)
+    if wash_ratio > 500: return 0.0, STATUS_WASH
+    # Sample std (ddof=1); a single loss has no deviation, which zeroes sortino
+    if neg_n > 1:
+        neg_mean = neg_sum / neg_n
+        sq_sum = 0.0
+        for i in range(n):
+            roi = (exit_p[i] - entry[i]) / entry[i]
+            if roi < 0: sq_sum += (roi - neg_mean) ** 2
+        downside = np.sqrt(sq_sum / (neg_n - 1))
+    elif neg_n == 1: downside = 0.0
+    else: downside = 0.01
+    sortino = (roi_sum / n) / downside if downside > 0 else 0.0
+    raw_score = (min(sortino, 3.0) / 3) * 60 + 40
+    return raw_score, STATUS_APPROVED if raw_score > 70 else STATUS_REJECTED
+
 class TribunalScorer:
-    def calculate_score(self, trade_history):
-        if not trade_history: return {'score': 0, 'status': 'NO_DATA'}
-        df = pd.DataFrame(trade_history)
-        df['pnl'] = (df['exit_price'] - df['entry_price']) * df['size']
-        df['roi'] = (df['exit_price'] - df['entry_price']) / df['entry_price']
-        total_vol = df['size'].sum()
-        total_pnl = df['pnl'].sum()
-        wash_ratio = total_vol / (abs(total_pnl) + 1)
-        if wash_ratio > 500: return {'score': 0, 'status': 'REJECTED_WASH_TRADING'}
-        neg_ret = df[df['roi'] < 0]['roi']
-        downside = neg_ret.std() if len(neg_ret) > 0 else 0.01
-        sortino = df['roi'].mean() / downside if downside > 0 else 0
-        raw_score = (min(sortino, 3) / 3) * 60 + 40 
-        return {'score': round(raw_score, 2), 'status': 'APPROVED' if raw_score > 70 else 'REJECTED'}
+    def calculate_score(self, entry, exit_p, size):
+        raw_score, status = score_kernel(entry, exit_p, size)
+        if status in (STATUS_NO_DATA, STATUS_WASH): return {'score': 0, 'status': STATUS_NAMES[status]}
+        return {'score': round(raw_score, 2), 'status': STATUS_NAMES[status]}
 
 # --- 7. MOCK GENERATOR (STILL USED FOR SCANNER SIM) ---
+# Set BOT_SEED for a reproducible run (scanner, execution and mock histories)
+_seed = os.getenv("BOT_SEED")
+_rng = np.random.default_rng(int(_seed) if _seed else None)
+
 class ProfileGenerator:
+    # Exit/entry multiplier range per trader archetype
+    MODES = {'GOD': (1.1, 1.8), 'REKT': (0.1, 0.9), 'MID': (0.8, 1.2)}
+
     @staticmethod
-    def generate():
-        trades = []
-        mode = random.choice(['GOD', 'REKT', 'MID'])
-        for _ in range(20):
-            entry = random.uniform(0.3, 0.7)
-            if mode == 'GOD': exit_p = entry * random.uniform(1.1, 1.8)
-            elif mode == 'REKT': exit_p = entry * random.uniform(0.1, 0.9)
-            else: exit_p = entry * random.uniform(0.8, 1.2)
-            trades.append({'entry_price': entry, 'exit_price': exit_p, 'size': random.uniform(100, 1000)})
-        return trades
+    def generate(n=20):
+        # Returns (entry, exit, size) arrays, one vectorized draw per column
+        modes = list(ProfileGenerator.MODES.values())
+        mult_range = modes[_rng.integers(len(modes))]
+        entry = _rng.uniform(0.3, 0.7, n)
+        exit_p = entry * _rng.uniform(*mult_range, n)
+        size = _rng.uniform(100, 1000, n)
+        return entry, exit_p, size
 
 # --- 8. MAIN ENGINE (UPDATED) ---
 class DiscoveryEngine:
@@ -168,43 +359,44 @@ class DiscoveryEngine:
         self.tribunal = TribunalScorer()
         self.gamma = GammaClient() # <--- NEW: Real Data Client
         self.bankroll = 10000
+        self.tribunal.calculate_score(np.ones(2), np.ones(2), np.ones(2)) # Warm the numba JIT
         state.add_log("v2.7.0 GAMMA ENGINE ONLINE", "SYSTEM")
         
-    def run(self):
+    async def run_forever(self):
+        try:
+            await self._run()
+        finally:
+            await self.gamma.close()
+
+    async def _run(self):
         while True:
             # 1. UPDATE MARKET DATA (REAL)
-            trump_price = self.gamma.get_trump_price()
+            trump_price = await self.gamma.get_trump_price()
             
             # 2. UPDATE ACTIVE POSITIONS
-            for pos in state.positions:
-                if pos['market'] == "Trump 2024 Election Winner":
-                    # Update current price and PnL based on REAL market data
-                    pos['currentPrice'] = trump_price
-                    # PnL calc: (Current Value - Cost Basis)
-                    # Shares = Size / EntryPrice
-                    shares = pos['size'] / pos['entryPrice']
-                    current_value = shares * trump_price
-                    pos['pnl'] = round(current_value - pos['size'], 2)
-                    pos['roi'] = round((trump_price - pos['entryPrice']) / pos['entryPrice'], 4)
+            # PnL = (Shares * Current Price) - Cost Basis, with Shares = Size / EntryPrice
+            state.update_positions("Trump 2024 Election Winner", trump_price)
+
+            # One batch of draws per tick: [scanner gate, execution gate, whale pick, address x2]
+            r = _rng.random(size=5)
 
             # 3. SCANNER (Simulated Whale Discovery)
-            if random.random() > 0.8:
-                candidate = f"0x{random.randint(1000,9999)}...{random.randint(1000,9999)}"
+            if r[0] > 0.8:
+                candidate = f"0x{1000 + int(r[3] * 9000)}...{1000 + int(r[4] * 9000)}"
                 state.add_log(f"⚖️ [TRIBUNAL] Convening court for {candidate}...", "SCANNER")
                 history = ProfileGenerator.generate()
-                result = self.tribunal.calculate_score(history)
+                result = self.tribunal.calculate_score(*history)
                 if result['status'] == 'APPROVED':
                     score = result['score']
                     state.add_log(f"✅ [APPROVED] Score: {score}. Adding to Watchlist.", "SCANNER")
-                    state.watchlist.append({'address': candidate, 'scoreA': score, 'pnl': 0})
-                    if len(state.watchlist) > 8: state.watchlist.pop(0)
-                    state.save_state()
+                    state.add_whale({'address': candidate, 'scoreA': score, 'pnl': 0})
+                    state.mark_dirty()
                 else:
                     state.add_log(f"❌ [REJECTED] Reason: {result['status']}", "SCANNER")
             
             # 4. EXECUTION (Using REAL Price)
-            if len(state.watchlist) > 0 and random.random() > 0.7:
-                whale = random.choice(state.watchlist)
+            if len(state.watchlist) > 0 and r[1] > 0.7:
+                whale = state.watchlist[int(r[2] * len(state.watchlist))]
                 # Odds are now derived from REAL price (1 / price)
                 real_odds = 1 / max(trump_price, 0.01)
                 prob = whale['scoreA'] / 100
@@ -214,7 +406,7 @@ class DiscoveryEngine:
                 if size > 10:
                     state.add_log(f"🔴 LIVE SIGNAL: {whale['address']} bought 'Trump Winner' @ {trump_price}", "EXECUTION")
                     
-                    state.positions.append({
+                    state.add_position({
                         "id": str(int(time.time())),
                         "market": "Trump 2024 Election Winner",
                         "whale": whale['address'],
@@ -226,10 +418,19 @@ class DiscoveryEngine:
                         "roi": 0,
                         "timestamp": int(time.time() * 1000)
                     })
-                    state.save_state()
+                    state.mark_dirty()
             
-            time.sleep(2)
+            state.maybe_flush()
+            await asyncio.sleep(2)
+
+async def main():
+    runner = await start_api_server()
+    try:
+        await DiscoveryEngine().run_forever()
+    finally:
+        await runner.cleanup()
 
 if __name__ == "__main__":
-    bot = DiscoveryEngine()
-    bot.run()
+    # Turn SIGTERM (container stop) into a normal exit so atexit flushes state
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    asyncio.run(main())